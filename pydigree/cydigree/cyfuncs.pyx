@@ -1,7 +1,26 @@
+from numbers import Integral
+
 import numpy as np
 cimport numpy as np
 cimport cython
-from libc.stdint cimport int32_t, uint32_t
+from libc.stdint cimport int8_t, int32_t, uint32_t
+
+cdef extern from *:
+    int __builtin_popcountll(unsigned long long) nogil
+
+cdef inline bint is_integer(x):
+    return isinstance(x, int) or isinstance(x, Integral)
+
+cdef inline int ibs_codes(long a, long b, long c, long d) nogil:
+    # IBS is the better of the two ways of pairing up the alleles, 
+    # which avoids branching on each comparison. Returns -1 if any allele
+    # is missing (coded 0).
+    cdef int straight = (a == c) + (b == d)
+    cdef int crossed = (a == d) + (b == c)
+    cdef int best = straight if straight > crossed else crossed
+    cdef int present = (a != 0) & (b != 0) & (c != 0) & (d != 0)
+    return present * (best + 1) - 1
+
 
 cpdef ibs(g1,g2, missingval=None):
     '''
@@ -16,14 +35,24 @@ cpdef ibs(g1,g2, missingval=None):
     '''
     a, b = g1
     c, d = g2
- 
+
+    cdef int state
+    if (is_integer(a) and is_integer(b) and 
+            is_integer(c) and is_integer(d)):
+        try:
+            state = ibs_codes(a, b, c, d)
+        except OverflowError:
+            pass
+        else:
+            if state < 0:
+                return missingval
+            return state
+
+    # Alleles that aren't integer codes
     if not (a and b and c and d):
         return missingval
-    if (a == c and b == d) or (a == d and b == c):
-        return 2
-    elif a == c or a == d or b == c or b == d:
-        return 1
-    return 0
+    # int() since adding numpy bools is a logical or
+    return max(int(a == c) + int(b == d), int(a == d) + int(b == c))
 
 
 def runs(sequence, predicate, Py_ssize_t minlength=2):
@@ -123,6 +152,170 @@ def runs_gte_uint8(np.ndarray[np.uint8_t] sequence, np.uint8_t minval, Py_ssize_
         out.append((start, i))
     return out
 
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def sparse_eq_int8(uint32_t[::1] idx_a, int8_t[::1] val_a, int8_t ref_a,
+                   uint32_t[::1] idx_b, int8_t[::1] val_b, int8_t ref_b,
+                   Py_ssize_t n):
+    """
+    Elementwise equality of two sparse arrays given as sorted non-sparse
+    indices and their values. Sites where neither array has a 
+    non-sparse value are equal if the sparse values are.
+
+    :param idx_a: sorted non-sparse indices of the first array
+    :param val_a: values at idx_a
+    :param ref_a: sparse value of the first array
+    :param idx_b: sorted non-sparse indices of the second array
+    :param val_b: values at idx_b
+    :param ref_b: sparse value of the second array
+    :param n: size of the arrays
+
+    :returns: equality at each site
+    :rtype: numpy array of type bool 
+    """
+    output = np.full(n, ref_a == ref_b, dtype=np.bool_)
+    cdef np.uint8_t[::1] out = output.view(np.uint8)
+
+    cdef Py_ssize_t na = idx_a.shape[0]
+    cdef Py_ssize_t nb = idx_b.shape[0]
+    cdef Py_ssize_t i = 0, j = 0
+
+    if val_a.shape[0] != na or val_b.shape[0] != nb:
+        raise ValueError('Indices and values must be the same length')
+
+    # The indices are sorted, so checking the last one of each array
+    # keeps every write below inside the output
+    if (na and idx_a[na - 1] >= n) or (nb and idx_b[nb - 1] >= n):
+        raise IndexError('Sparse index out of range')
+
+    while i < na and j < nb:
+        if idx_a[i] < idx_b[j]:
+            out[idx_a[i]] = val_a[i] == ref_b
+            i += 1
+        elif idx_b[j] < idx_a[i]:
+            out[idx_b[j]] = val_b[j] == ref_a
+            j += 1
+        else:
+            out[idx_a[i]] = val_a[i] == val_b[j]
+            i += 1
+            j += 1
+
+    while i < na:
+        out[idx_a[i]] = val_a[i] == ref_b
+        i += 1
+
+    while j < nb:
+        out[idx_b[j]] = val_b[j] == ref_a
+        j += 1
+
+    return output
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def popcount_uint64(np.uint64_t[::1] words):
+    """
+    Counts the set bits in an array of 64-bit words
+
+    :param words: values to count
+    :type words: numpy array of type uint64
+
+    :returns: number of set bits
+    :rtype: int
+    """
+    cdef Py_ssize_t total = 0
+    cdef Py_ssize_t i
+    for i in range(words.shape[0]):
+        total += __builtin_popcountll(words[i])
+    return total
+
+cpdef int add_allele_label(label, list labels) except -1:
+    """
+    Gives an allele label a uint8 code at a marker, where labels[k] is 
+    the label for code k + 1 (or None if the code is unused). Numeric labels
+    (e.g. '1' and '2' in PLINK files) are coded as their own value when it 
+    is free, so code 1 is always allele '1'. Other labels get the lowest 
+    unused code, so the first two alleles seen at a marker are 1 and 2.
+
+    :param label: the allele label
+    :param labels: labels already in use at the marker, updated in place
+    :type labels: list
+
+    :returns: the code for the label
+    :rtype: int
+    """
+    cdef Py_ssize_t code, value
+
+    if isinstance(label, str) and label.isdecimal():
+        value = int(label) if len(label) < 4 else 0
+        if 0 < value < 256 and str(value) == label:
+            if value > len(labels):
+                labels.extend([None] * (value - len(labels)))
+            if labels[value - 1] is None:
+                labels[value - 1] = label
+                return value
+
+    for code in range(len(labels)):
+        if labels[code] is None:
+            labels[code] = label
+            return code + 1
+
+    if len(labels) == 255:
+        raise ValueError('Too many distinct alleles at marker')
+    labels.append(label)
+    return len(labels)
+
+cdef inline int allele_code(label, list labels, missing_code) except -1:
+    if label == missing_code:
+        return 0
+
+    cdef Py_ssize_t code
+    for code in range(len(labels)):
+        if labels[code] == label:
+            return code + 1
+
+    return add_allele_label(label, labels)
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def encode_sequential_alleles(list alleles, Py_ssize_t start, 
+                              Py_ssize_t nmark, list labels, missing_code):
+    """
+    Converts a run of sequential allele labels (a1 b1 a2 b2 ...) into 
+    uint8 codes, separating the two strands in the same pass. Each marker
+    has its own codes, given by a list of the labels at that marker (see
+    add_allele_label). Labels without a code are added, missing alleles 
+    are coded 0.
+
+    :param alleles: allele labels
+    :param start: index of the first allele to convert
+    :param nmark: number of markers (allele pairs) to convert
+    :param labels: the allele labels at each marker
+    :param missing_code: label for missing alleles
+    :type alleles: list of strings
+    :type labels: list of lists
+
+    :returns: codes for each strand
+    :rtype: 2-tuple of numpy arrays of type uint8
+    """
+    if start < 0 or nmark < 0 or len(alleles) < start + 2 * nmark:
+        raise ValueError('Not enough alleles')
+    if len(labels) < nmark:
+        raise ValueError('Not enough markers for alleles')
+
+    strand_a = np.empty(nmark, dtype=np.uint8)
+    strand_b = np.empty(nmark, dtype=np.uint8)
+    cdef np.uint8_t[::1] a = strand_a
+    cdef np.uint8_t[::1] b = strand_b
+
+    cdef Py_ssize_t i
+    cdef list marker
+    for i in range(nmark):
+        marker = labels[i]
+        a[i] = allele_code(alleles[start + 2 * i], marker, missing_code)
+        b[i] = allele_code(alleles[start + 2 * i + 1], marker, missing_code)
+
+    return strand_a, strand_b
+
 @cython.boundscheck(False)
 @cython.wraparound(False)
 def fastfirstitem(tuple2d):
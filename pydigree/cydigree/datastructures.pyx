@@ -1,4 +1,4 @@
-from collections import Sequence
+from collections.abc import Sequence
 from libc.stdint cimport uint32_t, uint8_t, int8_t
 from libc.stdio cimport printf
 from cpython.mem cimport PyMem_Malloc, PyMem_Free
@@ -1,11 +1,14 @@
-from collections import Sequence
+from collections.abc import Sequence
 
 from cython.operator cimport dereference as deref, preincrement as inc
 
 from libc.stdint cimport uint32_t, int8_t
 from libcpp.map cimport map as stlmap
+from libcpp.utility cimport pair
 from libcpp.vector cimport vector
 
+import numpy as np
+
 
 ctypedef uint32_t sparsekey
 ctypedef int8_t sparseval
@@ -65,6 +68,15 @@ cdef class SparseArray:
     def __len__(self):
         return self.size
 
+    def __reduce__(self):
+        return (SparseArray, (self.size, self.ref), self.items())
+
+    def __setstate__(self, items):
+        cdef sparsekey k
+        cdef sparseval v
+        for k, v in items:
+            self.set_item(k, v)
+
     def keys(self):
         """
         Gets the non-sparse locations
@@ -92,6 +104,31 @@ cdef class SparseArray:
         """
         return [(x.first, x.second) for x in self.data]
 
+    def nonsparse_arrays(self):
+        """
+        Gets the non-sparse indices and their values as a pair of 
+        aligned numpy arrays
+
+        :returns: non-sparse locations and values
+        :rtype: tuple of (np.uint32 array, np.int8 array)
+        """
+        cdef sparsekey n = self.data.size()
+        keyarr = np.empty(n, dtype=np.uint32)
+        valarr = np.empty(n, dtype=np.int8)
+
+        cdef sparsekey[::1] keys = keyarr
+        cdef sparseval[::1] values = valarr
+        cdef sparsekey i = 0
+
+        cdef stlmap[sparsekey, sparseval].iterator it = self.data.begin()
+        while it != self.data.end():
+            keys[i] = deref(it).first
+            values[i] = deref(it).second
+            inc(it)
+            inc(i)
+
+        return keyarr, valarr
+
     cpdef bint any(self):
         """
         Are there any non-sparse values?
@@ -114,15 +151,32 @@ cdef class SparseArray:
         :rtype: SparseArray
         """
 
-        cdef SparseArray out = SparseArray(len(seq), refcode)
-
-        cdef int k = 0
-        cdef sparseval v
-        for v in seq:
-            if v != refcode:
-                out.set_item(k, v)
-
-            k += 1
+        dense = np.asarray(seq)
+        cdef SparseArray out = SparseArray(dense.shape[0], refcode)
+
+        # Locate the non-sparse sites in a single numpy pass instead of
+        # comparing every element at the python level
+        nonref = np.flatnonzero(dense != refcode)
+        nonref_values = dense[nonref]
+
+        # Casting to int8 would silently wrap or truncate bad values
+        if nonref_values.dtype.kind not in 'biu':
+            if not (nonref_values.dtype.kind == 'f' and 
+                    (nonref_values == np.trunc(nonref_values)).all()):
+                raise ValueError('SparseArray values must be integers')
+        if nonref_values.size and (nonref_values.min() < -128 or 
+                                   nonref_values.max() > 127):
+            raise ValueError('SparseArray values must be between -128 and 127')
+
+        cdef sparsekey[::1] keys = nonref.astype(np.uint32)
+        cdef sparseval[::1] values = nonref_values.astype(np.int8)
+
+        # Keys arrive in ascending order, so hinting the insert at the end
+        # of the map makes each insertion amortized constant time
+        cdef Py_ssize_t i
+        for i in range(keys.shape[0]):
+            out.data.insert(out.data.end(),
+                            pair[sparsekey, sparseval](keys[i], values[i]))
 
         return out 
 
@@ -425,16 +479,36 @@ cdef class SparseArray:
             
     cpdef SparseArray sparse_eq(self, SparseArray other):
         cdef SparseArray out = SparseArray(self.size, self.ref == other.ref)
-        
+
+        cdef stlmap[sparsekey, sparseval].iterator a = self.data.begin()
+        cdef stlmap[sparsekey, sparseval].iterator a_end = self.data.end()
+        cdef stlmap[sparsekey, sparseval].iterator b = other.data.begin()
+        cdef stlmap[sparsekey, sparseval].iterator b_end = other.data.end()
+
         cdef sparsekey k
         cdef sparseval v
 
-        # This can definitely be done faster
-        for k,v in self.data:
-            out.set_item(k, other.get_item(k) == v)
-
-        for k,v in other.data:
-            out.set_item(k, self.get_item(k) == v)
+        # Both maps are sorted by key, so a single merge over the two of
+        # them visits every non-sparse site once. Keys only present in one 
+        # array are compared against the other array's sparse value. 
+        while a != a_end or b != b_end:
+            if b == b_end or (a != a_end and deref(a).first < deref(b).first):
+                k = deref(a).first
+                v = deref(a).second == other.ref
+                inc(a)
+            elif a == a_end or deref(b).first < deref(a).first:
+                k = deref(b).first
+                v = deref(b).second == self.ref
+                inc(b)
+            else:
+                k = deref(a).first
+                v = deref(a).second == deref(b).second
+                inc(a)
+                inc(b)
+
+            # Output keys are ascending too, so append at the end of the map
+            if v != out.ref:
+                out.data.insert(out.data.end(), pair[sparsekey, sparseval](k, v))
 
         return out
 
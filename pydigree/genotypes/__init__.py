@@ -1,5 +1,6 @@
 from .genoabc import AlleleContainer
 from .alleles import Alleles
 from .sparsealleles import SparseAlleles
+from .genotypematrix import GenotypeMatrix
 from .chromosometemplate import ChromosomeTemplate, ChromosomeSet
 from .labelledalleles import LabelledAlleles, InheritanceSpan, AncestralAllele
@@ -10,14 +10,22 @@ class Alleles(np.ndarray, AlleleContainer):
         obj.template = template
         return obj
 
-    def __array__finalize__(self, obj):
+    def __array_finalize__(self, obj):
+        # The missing code is worked out when first needed and kept for 
+        # as long as the dtype stays the same. The dtype can change after  
+        # the array is made (e.g. when unpickling), so it's not set here.
+        self._missingdtype = None
         if obj is None:
             return
         self.template = getattr(obj, 'template', None)
 
     @property
     def missingcode(self):
-        return 0 if np.issubdtype(self.dtype, np.integer) else ''
+        dtype = self.dtype
+        if dtype is not self._missingdtype:
+            self._missingcode = 0 if np.issubdtype(dtype, np.integer) else ''
+            self._missingdtype = dtype
+        return self._missingcode
 
     @property
     def missing(self):
@@ -5,10 +5,15 @@ from bisect import bisect_right
 import numpy as np
 
 from pydigree.common import cumsum
-from pydigree.genotypes import Alleles, SparseAlleles
+from pydigree.cydigree.cyfuncs import encode_sequential_alleles
+from pydigree.genotypes import Alleles, SparseAlleles, GenotypeMatrix
 from pydigree.exceptions import SimulationError
 from pydigree.io.genomesimla import read_gs_chromosome_template
 
+# Maximum number of alleles drawn at once when simulating chromosomes 
+# in linkage equilibrium
+LE_BLOCK_SIZE = 2 ** 22
+
 
 class ChromosomeSet(object):
     """
@@ -132,6 +137,11 @@ class ChromosomeTemplate(object):
     studies for linkage analysis.
     """
 
+    # Many templates can be made when reading files, so no instance dict
+    __slots__ = ('final', 'label', 'genetic_map', 'physical_map', 
+                 '_frequencies', '_nfrequencies', 'labels', 'reference', 'alternates', 
+                 'allele_labels')
+
     def __init__(self, label=None):
         self.final = False
         # Chromosome name
@@ -140,14 +150,21 @@ class ChromosomeTemplate(object):
         self.genetic_map = []
         # A list of integers that doesnt do anything. Just for decoration
         self.physical_map = []
-        # A list of floats representing minor allele frequencies
-        self.frequencies = []
+        # Minor allele frequencies. Stored in an array with room to grow
+        # as markers are added, the first _nfrequencies are in use 
+        # (see the frequencies property)
+        self._frequencies = np.empty(0, dtype=np.float64)
+        self._nfrequencies = 0
         # List of marker names
         self.labels = []
         # Reference Alleles
         self.reference = []
         # Alternates
         self.alternates = []
+        # The allele labels read from files at each marker. Alleles objects
+        # store labels[k] as the uint8 code k + 1, with code 0 reserved for
+        # missing alleles.
+        self.allele_labels = []
 
     def __str__(self):
         return 'ChromosomeTemplate object %s: %s markers, %s cM' % \
@@ -155,6 +172,20 @@ class ChromosomeTemplate(object):
              len(self.frequencies),
              max(self.genetic_map) if self.genetic_map else 0)
 
+    @property
+    def frequencies(self):
+        """
+        The minor allele frequencies of each marker 
+
+        :rtype: np.array
+        """
+        return self._frequencies[:self._nfrequencies]
+
+    @frequencies.setter
+    def frequencies(self, value):
+        self._frequencies = np.array(value, dtype=np.float64)
+        self._nfrequencies = self._frequencies.shape[0]
+
     @property
     def outputlabel(self):
         ''' The label outputted when written to disk '''
@@ -213,8 +244,16 @@ class ChromosomeTemplate(object):
             frequency = float(frequency) if frequency is not None else -1
         except TypeError:
             raise ValueError('Invalid value for frequency %s' % frequency)
+        # Grow the frequency array geometrically, so adding N markers
+        # costs O(N) even when frequencies are read in between
+        if self._nfrequencies == self._frequencies.shape[0]:
+            grown = np.empty(max(16, 2 * self._nfrequencies), dtype=np.float64)
+            grown[:self._nfrequencies] = self.frequencies
+            self._frequencies = grown
+        self._frequencies[self._nfrequencies] = frequency if frequency else 0
+        self._nfrequencies += 1
+
         self.genetic_map.append(map_position if map_position else 0)
-        self.frequencies.append(frequency if frequency else 0)
         self.physical_map.append(bp if bp else 0)
         self.labels.append(label)
         self.reference.append(reference)
@@ -232,6 +271,112 @@ class ChromosomeTemplate(object):
         """
         self.frequencies[position] = frequency
 
+    def marker_allele_labels(self):
+        """
+        Gets the allele labels at each marker, making room for markers 
+        added since the last time alleles were read.
+
+        :returns: labels for each marker, labels[k] having the code k + 1
+        :rtype: list of lists 
+        """
+        missing = self.nmark() - len(self.allele_labels)
+        if missing > 0:
+            self.allele_labels.extend([] for _ in range(missing))
+        return self.allele_labels
+
+    def encode_alleles(self, alleles, missing_code='0'):
+        """
+        Converts sequential allele labels for every marker on the 
+        chromosome (e.g. '1'/'2' or 'A'/'C' from a PLINK file) to the uint8 
+        codes used at each marker. Labels not seen before are added 
+        to allele_labels. Numeric labels are coded as their own value where 
+        possible, the first other labels seen at a marker are coded 1 and 2.
+
+        :param alleles: allele labels
+        :param missing_code: label representing a missing allele
+        :type alleles: sequence of strings
+
+        :returns: allele codes, with missing alleles coded as 0
+        :rtype: np.array of type uint8
+        """
+        if isinstance(alleles, np.ndarray):
+            alleles = alleles.tolist()
+        else:
+            alleles = list(alleles)
+
+        nmark = self.nmark()
+        if len(alleles) != 2 * nmark:
+            raise ValueError('Expected {} alleles, got {}'.format(2 * nmark, 
+                                                                 len(alleles)))
+
+        strand_a, strand_b = encode_sequential_alleles(
+            alleles, 0, nmark, self.marker_allele_labels(), missing_code)
+
+        codes = np.empty(2 * nmark, dtype=np.uint8)
+        codes[0::2] = strand_a
+        codes[1::2] = strand_b
+        return codes
+
+    def allele_code(self, index, allele):
+        """
+        Gets the uint8 code stored in Alleles objects for an allele label 
+        at a marker. Alleles that aren't labels read from a file are 
+        returned as-is.
+
+        :param index: the marker
+        :param allele: the allele label
+        :returns: the code for the allele
+        """
+        if isinstance(allele, str) and index < len(self.allele_labels):
+            labels = self.allele_labels[index]
+            if allele in labels:
+                return labels.index(allele) + 1
+        return allele
+
+    def allele_label(self, index, code):
+        """
+        Gets the allele label that a uint8 code at a marker was read from.
+        Codes without a label are returned as-is.
+
+        :param index: the marker
+        :param code: the allele code
+        :returns: the label for the allele
+        """
+        if isinstance(code, (int, np.integer)) and index < len(self.allele_labels):
+            labels = self.allele_labels[index]
+            if 0 < code <= len(labels) and labels[code - 1] is not None:
+                return labels[code - 1]
+        return code
+
+    def decode_alleles(self, codes, missing_code='0'):
+        """
+        Converts the uint8 allele codes of a chromosome back to the labels 
+        they were read from. Codes without a label (e.g. simulated alleles)
+        are converted to strings.
+
+        :param codes: allele codes for each marker
+        :param missing_code: label to use for missing alleles
+        :type codes: sequence of ints
+
+        :returns: allele labels
+        :rtype: np.array of type object
+        """
+        codes = np.asarray(codes).tolist()
+        allele_labels = self.allele_labels
+        nlabelled = len(allele_labels)
+
+        decoded = np.empty(len(codes), dtype=object)
+        for i, code in enumerate(codes):
+            if code == 0:
+                decoded[i] = missing_code
+                continue
+
+            labels = allele_labels[i] if i < nlabelled else ()
+            label = labels[code - 1] if 0 < code <= len(labels) else None
+            decoded[i] = label if label is not None else str(code)
+
+        return decoded
+
     def empty_chromosome(self, dtype=np.uint8, sparse=False, refcode=None):
         """
         Produces a completely empty chromosome associated with this template.
@@ -297,7 +442,7 @@ class ChromosomeTemplate(object):
         :rtype: void
         """
         self.final = True
-        self.frequencies = np.array(self.frequencies)
+        self.frequencies = np.array(self.frequencies, dtype=np.float64)
         self.physical_map = np.array(self.physical_map, dtype=np.int)
         self.genetic_map = np.array(self.genetic_map)
 
@@ -313,8 +458,7 @@ class ChromosomeTemplate(object):
         """
         if (self.frequencies < 0).any():
             raise ValueError('Not all frequencies are specified')
-        r = np.random.random(self.nmark())
-        r = np.array(r < self.frequencies, dtype=np.int8) + 1
+        r = self._linkageequilibrium_alleles(self.nmark())
 
         if sparse:
             return SparseAlleles(r - 1, refcode=0, template=self)
@@ -323,6 +467,35 @@ class ChromosomeTemplate(object):
 
     def linkageequilibrium_chromosomes(self, nchrom):
         """ Returns a numpy array of many randomly generated chromosomes """
-        chroms = np.random.random((nchrom, self.nmark()))
-        chroms = np.int8((chroms < self.frequencies) + 1)
-        return [Alleles(r) for r in chroms]
+        chroms = self._linkageequilibrium_alleles((nchrom, self.nmark()))
+        return GenotypeMatrix(chroms, template=self).rows()
+
+    def _linkageequilibrium_alleles(self, shape):
+        """
+        Draws independent alleles for each marker, coded 1 for the major 
+        allele and 2 for the minor allele.
+
+        Uniform 32-bit integers are compared against the frequencies 
+        scaled to 2^32, which moves half the memory of drawing doubles.
+        Chromosomes are drawn in blocks of rows written straight into the
+        uint8 output, so the random draws never take more than
+        LE_BLOCK_SIZE alleles worth of memory.
+
+        :param shape: number of markers, or (chromosomes, markers)
+        
+        :rtype: np.array of type uint8
+        """
+        thresholds = self.frequencies * 2.0**32
+        nchrom, nmark = (1, shape) if np.ndim(shape) == 0 else shape
+
+        alleles = np.empty((nchrom, nmark), dtype=np.uint8)
+        rows_per_block = max(1, LE_BLOCK_SIZE // max(nmark, 1))
+
+        for start in range(0, nchrom, rows_per_block):
+            block = alleles[start:(start + rows_per_block)]
+            draws = np.random.randint(0, 2**32, size=block.shape, 
+                                      dtype=np.uint32)
+            np.less(draws, thresholds, out=block.view(np.bool_))
+            block += 1
+
+        return alleles.reshape(shape)
@@ -3,6 +3,9 @@ from pydigree.exceptions import NotMeaningfulError
 class AlleleContainer(object):
     " A base class for the interface allele containers object must implement"
 
+    # No instance dict here, so subclasses can use __slots__
+    __slots__ = ()
+
     def empty_like(self):
         raise NotImplementedError
 
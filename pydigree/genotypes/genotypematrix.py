@@ -0,0 +1,144 @@
+"A container for many chromosomes that share a template"
+
+import numpy as np
+
+from .alleles import Alleles
+
+
+class GenotypeMatrix(object):
+    '''
+    An object holding the haploid genotypes of many chromosomes associated
+    with the same ChromosomeTemplate as the rows of a single 2D array.
+    Operations over a whole population can then be done in a single numpy
+    call instead of looping over many small Alleles objects.
+
+    Rows are returned as Alleles objects that are views into the matrix, 
+    so changes made to a row are reflected in the matrix.
+
+    :ivar data: the alleles, one chromosome per row
+    :ivar template: the chromosome the alleles belong to
+    :type data: np.array with shape (nchrom, nmark)
+    :type template: ChromosomeTemplate
+    '''
+
+    def __init__(self, data, template=None):
+        data = np.asarray(data)
+        if data.ndim != 2:
+            raise ValueError('GenotypeMatrix data must be two dimensional')
+        self.data = data
+        self.template = template
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    def __getitem__(self, idx):
+        return self.row(idx)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.row(i)
+
+    def __array__(self, dtype=None):
+        if dtype is None:
+            return self.data
+        return self.data.astype(dtype, copy=False)
+
+    def __eq__(self, other):
+        return self.data == np.asarray(other)
+
+    def __ne__(self, other):
+        return self.data != np.asarray(other)
+
+    @property
+    def dtype(self):
+        return self.data.dtype
+
+    @property
+    def missingcode(self):
+        return 0 if np.issubdtype(self.dtype, np.integer) else ''
+
+    @property
+    def missing(self):
+        """
+        Returns a numpy array indicating which alleles are missing 
+
+        :returns: missingness array with the same shape as the matrix
+        :rtype: np.array
+        """
+        return self.data == self.missingcode
+
+    def nchrom(self):
+        '''
+        Returns the number of chromosomes (rows) in the matrix
+
+        :rtype: int
+        '''
+        return self.data.shape[0]
+
+    def nmark(self):
+        '''
+        Returns the number of markers on each chromosome
+
+        :rtype: int
+        '''
+        return self.data.shape[1]
+
+    def row(self, idx):
+        '''
+        Gets a chromosome from the matrix 
+
+        :param idx: index of the chromosome
+        :type idx: int
+
+        :returns: a view of the row
+        :rtype: Alleles
+        '''
+        return Alleles(self.data[idx], template=self.template)
+
+    def rows(self):
+        '''
+        Gets every chromosome in the matrix
+
+        :returns: views of each row
+        :rtype: list of Alleles
+        '''
+        return [Alleles(r, template=self.template) for r in self.data]
+
+    @staticmethod
+    def empty(nchrom, template=None, nmark=None, dtype=np.uint8):
+        '''
+        Creates a GenotypeMatrix where every allele is missing
+
+        :param nchrom: number of chromosomes
+        :param template: the chromosome associated with the alleles
+        :param nmark: number of markers, if no template is given
+        :type nchrom: int
+        :type template: ChromosomeTemplate
+        :type nmark: int
+
+        :rtype: GenotypeMatrix
+        '''
+        if nmark is None:
+            if template is None:
+                raise ValueError('No template or size')
+            nmark = template.nmark()
+
+        return GenotypeMatrix(np.zeros((nchrom, nmark), dtype=dtype), 
+                              template=template)
+
+    @staticmethod
+    def from_alleles(chromosomes, template=None):
+        '''
+        Copies a set of Alleles objects into a GenotypeMatrix
+
+        :param chromosomes: the chromosomes to combine
+        :param template: the chromosome associated with the alleles, 
+            by default the template of the first chromosome
+        :type chromosomes: sequence of Alleles
+
+        :rtype: GenotypeMatrix
+        '''
+        if template is None and len(chromosomes):
+            template = getattr(chromosomes[0], 'template', None)
+        return GenotypeMatrix(np.vstack([np.asarray(c) for c in chromosomes]), 
+                              template=template)
@@ -1,6 +1,7 @@
 import numpy as np
 
 from pydigree.cydigree.sparsearray import SparseArray
+from pydigree.cydigree.cyfuncs import sparse_eq_int8
 from pydigree.genotypes import AlleleContainer, Alleles
 from pydigree.common import mode
 
@@ -15,6 +16,8 @@ class SparseAlleles(AlleleContainer):
     Negative values are interpreted as missing.
     '''
 
+    __slots__ = ('template', 'container', 'size')
+
     def __init__(self, data=None, refcode=0, size=None, template=None):
         self.template = template
 
@@ -27,6 +30,7 @@ class SparseAlleles(AlleleContainer):
             elif template is not None and size is None:
                 size = self.template.nmark()
             self.container = SparseArray(size, refcode) 
+            self.size = size
             return 
 
         elif type(data) is SparseArray:
@@ -74,20 +78,27 @@ class SparseAlleles(AlleleContainer):
     @property
     def missing(self):
         " Returns a numpy array indicating which markers have missing data "
-        missingindices = [i for i,v in self.container.items() if v == self.missingcode]
-        base = np.zeros(self.size, dtype=np.bool_)
-        base[missingindices] = 1
+        keys, values = self.container.nonsparse_arrays()
+        base = np.full(self.nmark(), self.refcode == self.missingcode,
+                       dtype=np.bool_)
+        base[keys] = (values == self.missingcode)
         return base
 
     def __eq__(self, other):
         if type(other) is SparseAlleles:
-            return self.container == other.container
+            if self.nmark() != other.nmark():
+                raise ValueError('SparseAlleles are not the same length')
+            keys, values = self.container.nonsparse_arrays()
+            okeys, ovalues = other.container.nonsparse_arrays()
+            return sparse_eq_int8(keys, values, self.refcode,
+                                  okeys, ovalues, other.refcode,
+                                  self.nmark())
         else:
             return self.container == other
 
     def __ne__(self, other):
         if type(other) is SparseAlleles:
-            return self.container != other.container
+            return np.logical_not(self == other)
         else:
             return self.container != other
 
@@ -108,8 +119,10 @@ class SparseAlleles(AlleleContainer):
         :returns: dense version
         :rtype: Alleles
         """
-        dense = Alleles(self.container.tolist(), template=self.template)
-        return dense
+        keys, values = self.container.nonsparse_arrays()
+        dense = np.full(self.nmark(), self.refcode, dtype=np.int8)
+        dense[keys] = values
+        return Alleles(dense, template=self.template)
 
     def empty_like(self):
         """
@@ -213,7 +213,17 @@ class Individual(object):
         if is_missing_genotype(g):
             return None
         else:
-            return allele in g
+            return self._allele_code(location, allele) in g
+
+    def _allele_code(self, location, allele):
+        " Allele labels from files are stored as codes "
+        if not isinstance(allele, str):
+            return allele
+        try:
+            template = self.chromosomes[location[0]]
+        except (AttributeError, IndexError):
+            return allele
+        return template.allele_code(location[1], allele)
 
     def label_genotypes(self):
         """
@@ -455,6 +465,8 @@ class Individual(object):
             self.phenotypes[label] = None
             return
             
+        minor_allele = self._allele_code(locus, minor_allele)
+
         gt = self.get_genotype(locus)
         if is_missing_genotype(gt):
             val = None
@@ -158,6 +158,10 @@ class IndividualContainer(object):
         gen = (x for x in self.individuals if constraint(x))
         alleles = reduce(set.union, (set(x.get_genotype(location))
                                      for x in gen if x.has_genotypes())) - {0}
+
+        template = self._template(location)
+        if template is not None:
+            alleles = {template.allele_label(location[1], x) for x in alleles}
         return alleles
 
     def allele_list(self, location, constraint=None):
@@ -174,6 +178,13 @@ class IndividualContainer(object):
                                for x in gen if x.has_genotypes()))
         return [x for x in alleles if x != 0]
 
+    def _template(self, location):
+        " The ChromosomeTemplate for a locus, if there is one "
+        try:
+            return self.chromosomes[location[0]]
+        except (AttributeError, IndexError):
+            return None
+
     def allele_frequency(self, location, allele, constraint=None):
         """
         Returns the frequency (as a percentage) of an allele in this population
@@ -186,6 +197,10 @@ class IndividualContainer(object):
         :type constraint: callable
         :rtype: float 
         """
+        template = self._template(location)
+        if template is not None:
+            allele = template.allele_code(location[1], allele)
+
         alleles = self.allele_list(location, constraint=constraint)
         freqtab = table(alleles)
         if allele not in freqtab:
@@ -206,4 +221,9 @@ class IndividualContainer(object):
         freqtab = table(alleles)
         # Reverse sort the table by the count of alleles, and return the first
         # item's first item (i.e. the allele label)
-        return sorted(freqtab.items(), key=lambda x: x[1], reverse=True)[0][0]
+        major = sorted(freqtab.items(), key=lambda x: x[1], reverse=True)[0][0]
+
+        template = self._template(location)
+        if template is not None:
+            major = template.allele_label(location[1], major)
+        return major
@@ -1,4 +1,7 @@
+import csv
+
 import numpy as np
+import pandas as pd
 
 from pydigree.io.smartopen import smartopen
 from pydigree.population import Population
@@ -6,8 +9,11 @@ from pydigree.individual import Individual
 from pydigree.pedigree import Pedigree
 from pydigree.pedigreecollection import PedigreeCollection
 from pydigree.genotypes import Alleles, SparseAlleles
+from pydigree.cydigree.cyfuncs import all_same_type, encode_sequential_alleles
 
-from collections import Callable
+from collections import defaultdict
+from collections.abc import Callable
+from itertools import chain
 from functools import reduce
 
 sex_codes = {'1': 0, '2': 1, 
@@ -26,11 +32,34 @@ class PEDRecord(object):
         :type delimiter: string
         """
 
-        split = line.strip().split(delimiter)
-        self.fam, self.ind_id, self.fa, self.mo, self.sex = split[0:5]
-        self.aff = split[5] if len(split) > 5 else None
-        self.data = split[6:] if len(split) > 6 else None
+        self.set_fields(line.strip().split(delimiter))
+
+    @staticmethod
+    def from_fields(fields):
+        """
+        Creates pedigree record from an already split line
+
+        :param fields: the fields of the line
+        :type fields: sequence of strings
+
+        :rtype: PEDRecord
+        """
+        rec = PEDRecord.__new__(PEDRecord)
+        rec.set_fields(fields)
+        return rec
+
+    def set_fields(self, fields):
+        """
+        Assigns the record attributes from the fields of a line
 
+        :param fields: the fields of the line
+        :type fields: sequence of strings
+
+        :rtype: void
+        """
+        self.fam, self.ind_id, self.fa, self.mo, self.sex = fields[0:5]
+        self.aff = fields[5] if len(fields) > 5 else None
+        self.data = fields[6:] if len(fields) > 6 else None
 
     def create_individual(self, population=None):
         """
@@ -55,6 +84,67 @@ class PEDRecord(object):
         return ind
 
 
+class _PushbackFile(object):
+    " A file-like object that gives some already read text before the rest "
+
+    def __init__(self, head, f):
+        self.head = head
+        self.f = f
+
+    def read(self, size=-1):
+        if not self.head:
+            return self.f.read(size)
+        if size is None or size < 0:
+            out, self.head = self.head + self.f.read(), ''
+        else:
+            out, self.head = self.head[:size], self.head[size:]
+        return out
+
+    def __iter__(self):
+        head, self.head = self.head, ''
+        return chain([head] if head else [], self.f)
+
+
+def read_ped_columns(f, delimiter=None):
+    """
+    Reads only the pedigree columns (the first six) of a PED file.
+    Tokenizing is done by pandas, so any trailing data columns are never
+    split into python strings.
+
+    :param f: open PED file
+    :param delimiter: field separator, default: any whitespace
+    :type delimiter: string
+
+    :returns: records for each line in the file
+    :rtype: generator of PEDRecord
+    """
+    # Find the first line with any data on it
+    peeked = []
+    while True:
+        line = f.readline()
+        if not line:
+            # Nothing but blank lines
+            return
+        peeked.append(line)
+        if line.strip():
+            break
+
+    # Some files leave out the affection status column
+    ncol = min(len(line.strip().split(delimiter)), 6)
+
+    # The peeked lines are handed back to pandas instead of seeking, so 
+    # streams that can't seek (e.g. pipes) can be read too. IDs are split
+    # on the delimiter alone, as in PEDRecord, so quote characters aren't
+    # treated specially.
+    columns = pd.read_csv(_PushbackFile(''.join(peeked), f), 
+                          sep=delimiter if delimiter else r'\s+', 
+                          header=None, usecols=range(ncol), dtype=str, 
+                          na_filter=False, quoting=csv.QUOTE_NONE)
+
+    for fields in columns.itertuples(index=False, name=None):
+        yield PEDRecord.from_fields(fields)
+
+
 def connect_individuals(pop):
     """
     Makes the connections in the genealogy from parents to children
@@ -75,7 +165,26 @@ def connect_individuals(pop):
         ind.register_with_parents()
 
 
-def sort_pedigrees(inds, population_handler):
+def _connect_family(family):
+    """
+    Makes the connections in the genealogy for a single family, like 
+    connect_individuals.
+
+    :param family: Individuals to connect, by individual id. Parents must
+        be in the same family as their children.
+    :type family: dict (str -> Individual)
+
+    :rtype void:
+    """
+
+    for ind in family.values():
+        ind.father = family[ind.father] if ind.father != '0' else None
+        ind.mother = family[ind.mother] if ind.mother != '0' else None
+
+        ind.register_with_parents()
+
+
+def sort_pedigrees(inds, population_handler, connect_inds=False):
     """
     Takes a set of individuals and sorts them into pedigrees.
 
@@ -83,8 +192,10 @@ def sort_pedigrees(inds, population_handler):
 
     :param inds: Individuals to be sorted
     :param population_handler: a function to set up the population
+    :param connect_inds: build references between individuals
     :type inds: iterable
     :type population_handler: Callable
+    :type connect_inds: bool
 
     :returns: Collection of pedigrees from the individuals
     :rtype: PedigreeCollections
@@ -94,23 +205,28 @@ def sort_pedigrees(inds, population_handler):
 
     pc = PedigreeCollection()
 
-    inds = list(inds)
-    # A dict that maps pedigree labels to the corresponding individuals
-    pedigrees = {ind.label[0]: [] for ind in inds}
+    # A dict that maps pedigree labels to the corresponding individuals,
+    # by individual id
+    pedigrees = defaultdict(dict)
 
     for ind in inds:
-        pedigrees[ind.label[0]].append(ind)
+        pedigree_label, ind_id = ind.label
+        pedigrees[pedigree_label][ind_id] = ind
 
-
-    for pedigree_label, ped_inds in pedigrees.items():
+    for pedigree_label, family in pedigrees.items():
         ped = Pedigree(label=pedigree_label)
 
         population_handler(ped)
+
+        # Both parents are always in the same family, so they can be 
+        # resolved within the bucket
+        if connect_inds:
+            _connect_family(family)
         
         # Fix the labels 
-        for ind in ped_inds:
-            ind.label = ind.label[1]
-            ped[ind.label] = ind
+        for ind_id, ind in family.items():
+            ind.label = ind_id
+            ped[ind_id] = ind
             ind.population = ped
             ind.pedigree = ped
         
@@ -161,7 +277,10 @@ def read_ped(filename, population=None, delimiter=None, affected_labels=None,
         affected_labels = {'1': 0, '2': 1, 'A': 1, 'U': 0,
                            'X': None, '-9': None}
 
-    if not isinstance(data_handler, Callable):
+    # Without something to hand the data to, we only have to read the 
+    # pedigree columns
+    read_data = isinstance(data_handler, Callable)
+    if not read_data:
         data_handler = lambda *x: None
     
     if not isinstance(population_handler, Callable):
@@ -172,33 +291,33 @@ def read_ped(filename, population=None, delimiter=None, affected_labels=None,
 
     population_handler(p)
 
+    inds = []
+
     # Step 1: Read the data and create the individuals
     with smartopen(filename) as f:
         # Parse the lines in the file
-        for line in f:
-            rec = PEDRecord(line, delimiter)
-            
+        if read_data:
+            records = (PEDRecord(line, delimiter) for line in f)
+        else:
+            records = read_ped_columns(f, delimiter)
+
+        for rec in records:
             if onlyinds and (rec.ind_id not in onlyinds):
                 continue
 
             ind = rec.create_individual(population)
             ind.pedigree = p
             ind.phenotypes['affected'] = affected_labels.get(rec.aff, None)
-            p[ind.label] = ind
+            inds.append(ind)
 
             if rec.data:
-                data_handler(p[ind.label], rec.data)
-
-    # Step 2: Create the between-individual relationships
-
-    # Fix the individual-level data: individuals currently only have parent-ids
-    # in their parent fields and not references to actual individuals
-    if connect_inds:
-        connect_individuals(p)
-
-    # Step 3: Separate the individuals into pedigrees
-    pc = sort_pedigrees(p.individuals, population_handler)
+                data_handler(ind, rec.data)
 
+    # Step 2: Separate the individuals into pedigrees, creating the 
+    # between-individual relationships along the way. Individuals currently
+    # only have parent-ids in their parent fields and not references to 
+    # actual individuals.
+    pc = sort_pedigrees(inds, population_handler, connect_inds=connect_inds)
 
     return pc
 
@@ -220,24 +339,36 @@ def read_phenotypes(pedigrees, csvfile, delimiter=',', missingcode='X'):
     :rtype: void
     """
     with smartopen(csvfile) as f:
-        header = f.readline().strip().split(delimiter)
-        for line in f:
-            # Match columns to their column name
-            d = dict(list(zip(header, line.strip().split(delimiter))))
-            for k, v in list(d.items()):
-                
-                # Convert all phenotypes into floats
-                try:
-                    v = float(v)
-                except ValueError:
-                    if not v or v == missingcode:
-                        v = None
-                
-                if k in set(['famid', 'id']):
-                    continue
-                
-                fam, ind = d['famid'], d['id']
-                pedigrees[fam][ind].phenotypes[k] = v
+        table = pd.read_csv(f, sep=delimiter, dtype={'famid': str, 'id': str},
+                            keep_default_na=False, 
+                            na_values=[missingcode, ''])
+
+    # Look up each individual once, not once per phenotype
+    inds = [pedigrees[fam][ind] 
+            for fam, ind in zip(table['famid'], table['id'])]
+
+    for phenotype in table.columns:
+        if phenotype in {'famid', 'id'}:
+            continue
+
+        column = table[phenotype]
+
+        # Convert all phenotypes into floats, unless they can't be
+        if column.dtype.kind in 'biuf':
+            values = column.astype(np.float64).tolist()
+        else:
+            values = [_phenotype_value(v) for v in column]
+
+        for ind, value in zip(inds, values):
+            # NaN is the only value not equal to itself
+            ind.phenotypes[phenotype] = value if value == value else None
+
+
+def _phenotype_value(v):
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return v
 
 
 def write_pedigree(pedigrees, filename, delim=' '):
@@ -298,7 +429,8 @@ def write_phenotypes(pedigrees, filename, predicate=None,
             ofile.write(row + '\n')
 
 
-def genotypes_from_sequential_alleles(chromosomes, data, missing_code='0'):
+def genotypes_from_sequential_alleles(chromosomes, data, missing_code='0',
+                                      dtype=None):
     '''
     Takes a series of alleles and turns them into genotypes.
 
@@ -312,41 +444,117 @@ def genotypes_from_sequential_alleles(chromosomes, data, missing_code='0'):
     ::
         [(chroma, chromb), (chroma, chromb)...]
 
+    String alleles are stored as uint8 codes, using the allele_labels of 
+    each ChromosomeTemplate, with missing alleles coded as 0.
+
 
     :param chromosomes: genotype data
     :param data: The alleles to be turned into genotypes
     :param missing_code: value representing a missing allele
+    :param dtype: type of the alleles, if known. Default: inferred from data
 
     :type chromosomes: list of ChromosomeTemplate
     :type missing_code: string
+    :type dtype: numpy dtype
     :returns: A list of 2-tuples of Alleles objects
     '''
 
-    genotypes = []
+    # Lists of strings (e.g. split lines from a file) can be converted to
+    # codes in a single compiled pass
+    labels = dtype is None or np.issubdtype(dtype, np.str_)
+    if labels and isinstance(data, list) and all_same_type(data, str):
+        return genotypes_from_allele_labels(chromosomes, data, missing_code)
 
-    data = np.array(data)
+    original = data
+    data = np.ascontiguousarray(data, dtype=dtype)
 
-    if not np.issubdtype(type(missing_code), data.dtype):
+    # Any number can be the missing code for numeric alleles of any size
+    numeric = (np.issubdtype(data.dtype, np.number) and 
+               np.issubdtype(type(missing_code), np.number))
+    if not (numeric or np.issubdtype(type(missing_code), data.dtype)):
         raise ValueError(
             'Invalid type for missing code: {}. Expected: {}'.format(
                 type(missing_code), data.dtype))
 
-    if np.issubdtype(data.dtype, str):
-        data[data == missing_code] = ''
-    else:
+    encode = np.issubdtype(data.dtype, str)
+    if not encode:
+        # The alleles are zeroed in place, so only copy data if it is 
+        # still the caller's own array
+        if (isinstance(original, np.ndarray) and 
+                np.may_share_memory(data, original)):
+            data = data.copy()
         data[data == missing_code] = 0
 
-    strand_a = data[0::2]
-    strand_b = data[1::2]
+    # Split the alleles at the chromosome boundaries in one go
+    boundaries = 2 * np.cumsum([chrom.nmark() for chrom in chromosomes])
+    _check_allele_count(boundaries[-1] if len(boundaries) else 0, 
+                        data.shape[0])
+    boundaries = boundaries[:-1]
+
+    genotypes = []
+    for chrom, alleles in zip(chromosomes, np.split(data, boundaries)):
+        if encode:
+            alleles = chrom.encode_alleles(alleles, missing_code)
+
+        # Each row is one genotype
+        alleles = alleles.reshape(-1, 2)
+        chroma = Alleles(alleles[:, 0], template=chrom)
+        chromb = Alleles(alleles[:, 1], template=chrom)
+        genotypes.append((chroma, chromb))
+
+    return genotypes
+
+
+def _check_allele_count(expected, observed):
+    """
+    Makes sure there are the right number of alleles for the chromosomes
+    they're going to be split into.
+
+    :param expected: number of alleles the chromosomes take
+    :param observed: number of alleles available
+    :type expected: int
+    :type observed: int
+
+    :raises: ValueError if the counts don't match
+    :rtype: void
+    """
+    if expected != observed:
+        raise ValueError('Expected {} alleles, got {}'.format(expected, 
+                                                             observed))
+
+
+def genotypes_from_allele_labels(chromosomes, data, missing_code='0'):
+    '''
+    Turns a list of sequential allele labels into genotypes like 
+    genotypes_from_sequential_alleles, encoding and separating the strands
+    of each chromosome in one pass.
+
+    :param chromosomes: genotype data
+    :param data: The alleles to be turned into genotypes
+    :param missing_code: value representing a missing allele
+
+    :type chromosomes: list of ChromosomeTemplate
+    :type data: list of strings
+    :type missing_code: string
+    :returns: A list of 2-tuples of Alleles objects
+    '''
+    if not isinstance(missing_code, str):
+        raise ValueError(
+            'Invalid type for missing code: {}. Expected: {}'.format(
+                type(missing_code), str))
+
+    _check_allele_count(2 * sum(chrom.nmark() for chrom in chromosomes), 
+                        len(data))
 
+    genotypes = []
     start = 0
     for chrom in chromosomes:
-        size = chrom.nmark()
-        stop = start + size
-        chroma = Alleles(strand_a[start:stop], template=chrom)
-        chromb = Alleles(strand_b[start:stop], template=chrom)
-
-        genotypes.append((chroma, chromb))
-        start += size
+        nmark = chrom.nmark()
+        labels = chrom.marker_allele_labels()
+        chroma, chromb = encode_sequential_alleles(data, start, nmark, labels,
+                                                   missing_code)
+        genotypes.append((Alleles(chroma, template=chrom), 
+                          Alleles(chromb, template=chrom)))
+        start += 2 * nmark
 
     return genotypes
@@ -1,8 +1,15 @@
 "Read GenomeSIMLA formatted chromosome templates"
 
+import numpy as np
+
 import pydigree
 from pydigree.io.smartopen import smartopen
 
+# The columns of a marker line in a genomeSIMLA template
+gs_marker_dtype = np.dtype([('label', object), ('majf', np.float64),
+                            ('minf', np.float64), ('cm', np.float64),
+                            ('bp', np.int64)])
+
 
 def read_gs_chromosome_template(templatef):
     """
@@ -17,18 +24,24 @@ def read_gs_chromosome_template(templatef):
         label = f.readline().strip()  # The label and
         f.readline()  # the number of markers, both of which we dont need.
         c = pydigree.ChromosomeTemplate(label=label)
-        
-        # genomeSIMLA chromosome files have marginal recombination probs
-        # instead of map positions. We'll have to keep track of what the
-        # last position was and add to it to get it into the shape we want
-        # it to be in.
-        last_cm = 0
-        for line in f:
-            if line == '\n':
-                continue
-            label, _, minf, cm, bp = line.strip().split()
-            bp = int(bp)
-            cm = float(cm)
-            last_cm += cm
-            c.add_genotype(float(minf), last_cm, label=label, bp=bp)
+
+        markers = np.loadtxt(f, dtype=gs_marker_dtype, ndmin=1)
+
+    if not markers.size:
+        return c
+
+    nmark = markers.shape[0]
+
+    # genomeSIMLA chromosome files have marginal recombination probs
+    # instead of map positions, so the running total of them gives the
+    # map position we want
+    cm = np.cumsum(markers['cm'])
+
+    c.labels = markers['label'].tolist()
+    c.frequencies = markers['minf'].tolist()
+    c.genetic_map = cm.tolist()
+    c.physical_map = markers['bp'].tolist()
+    c.reference = [None] * nmark
+    c.alternates = [None] * nmark
+
     return c
@@ -6,7 +6,7 @@ from pydigree.io.base import read_ped
 from pydigree.io.base import genotypes_from_sequential_alleles as gt_from_seq
 from pydigree.exceptions import FileFormatError
 from pydigree.io.smartopen import smartopen
-import collections
+import collections.abc
 
 
 def create_pop_handler_func(mapfile):
@@ -179,7 +179,7 @@ def write_ped(pedigrees, pedfile, delim=' ', predicate=None,
         predicate = lambda x: x.phenotypes['affected'] == 1
     elif predicate == 'phenotyped':
         predicate = lambda x: x.phenotypes['affected'] in set([0, 1])
-    elif not isinstance(predicate, collections.Callable):
+    elif not isinstance(predicate, collections.abc.Callable):
         raise ValueError('Not a valid predicate!')
 
     pheno_label = {1: '2', 0: '1', None: '-9'}
@@ -214,8 +214,12 @@ def write_ped(pedigrees, pedfile, delim=' ', predicate=None,
                     if isinstance(chroma, SparseAlleles):
                         raise ValueError("Plink output not for Sparse Data")
 
-                    ga = chroma.astype(str).tolist()
-                    gb = chromb.astype(str).tolist()
+                    if template.allele_labels:
+                        ga = template.decode_alleles(chroma).tolist()
+                        gb = template.decode_alleles(chromb).tolist()
+                    else:
+                        ga = chroma.astype(str).tolist()
+                        gb = chromb.astype(str).tolist()
                     gn = interleave(ga, gb)
                     g.extend(gn)
 
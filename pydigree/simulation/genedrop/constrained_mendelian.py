@@ -5,7 +5,7 @@ from .simulation import GeneDroppingSimulation
 from pydigree.exceptions import SimulationError
 from pydigree import paths
 from pydigree import Individual
-import collections
+import collections.abc
 
 
 class ConstrainedMendelianSimulation(GeneDroppingSimulation):
@@ -80,7 +80,7 @@ class ConstrainedMendelianSimulation(GeneDroppingSimulation):
 
         # Now replace the label genotypes in the nonfounders with the
         # genotypes of the founders
-        if isinstance(self.only, collections.Callable):
+        if isinstance(self.only, collections.abc.Callable):
             siminds = [x for x in self.template.nonfounders() if self.only(x)]
         else:
             siminds = self.template.nonfounders()
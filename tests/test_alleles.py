@@ -4,6 +4,7 @@ from pydigree.population import Population
 from pydigree.individual import Individual
 from pydigree.genotypes import Alleles, SparseAlleles, ChromosomeTemplate
 from pydigree.genotypes import LabelledAlleles, InheritanceSpan
+from pydigree.genotypes import GenotypeMatrix
 from pydigree.exceptions import NotMeaningfulError
 import numpy as np
 
@@ -26,6 +27,23 @@ def test_alleles():
     eq = (a == b)
     assert (eq == np.array([True, False, False, True])).all()
 
+    # Views keep the template and get the right missing code
+    c = ChromosomeTemplate()
+    i = Alleles(np.array([1, 0, 2, 0], dtype=np.uint8), template=c)
+    assert i.missingcode == 0
+    assert i[1:3].template is c
+    assert (i[1:3].missing == [True, False]).all()
+    assert i.astype(str).missingcode == ''
+
+    # Unpickled arrays only get their real dtype after they're created
+    import pickle
+    s = pickle.loads(pickle.dumps(Alleles(np.array(['A', '', 'C']))))
+    assert s.missingcode == ''
+    assert s.missing.tolist() == [False, True, False]
+    u = pickle.loads(pickle.dumps(i))
+    assert u.missingcode == 0
+    assert u.missing.tolist() == [False, True, False, True]
+
     # Test copy span
     z = Alleles(np.zeros(10))
     o = Alleles(np.ones(10))
@@ -62,6 +80,22 @@ def test_sparsealleles():
     a[0] = a.missingcode
     assert list(a.missing) == [True, False, False, False, True, False] 
 
+def test_sparsealleles_todense():
+    c = ChromosomeTemplate()
+    for i in range(6):
+        c.add_genotype()
+
+    a = SparseAlleles(template=c, refcode=1)
+    assert a.size == a.nmark() == 6
+    dense = a.todense()
+    assert dense.dtype == np.int8
+    assert dense.template is c
+    assert dense.tolist() == [1] * 6
+
+    a[2] = 3
+    a[5] = -1
+    assert a.todense().tolist() == [1, 1, 3, 1, 1, -1]
+
 def test_sparsealleles_meaninglesscomparisions():
     # Comparsions like >, <, >=, <= aren't meaningful for genotypes
     a = SparseAlleles([1,2,3,-1])
@@ -73,13 +107,40 @@ def test_sparsealleles_meaninglesscomparisions():
     assert_raises(NotMeaningfulError, lambda x, y: x >= y, a, b)
     assert_raises(NotMeaningfulError, lambda x, y: x <= y, a, b)
 
-# def test_sparseeq():
-#     a = SparseAlleles([1,2,3,4])
-#     b = SparseAlleles([1,3,3,4])
-
-#     obs = (a == b)
-#     expected = np.array([True, False, True, True]) 
-#     assert obs.tolist() == expected.tolist()
+def test_sparseeq():
+    a = SparseAlleles([1,2,3,4])
+    b = SparseAlleles([1,3,3,4])
+
+    obs = (a == b)
+    expected = np.array([True, False, True, True]) 
+    assert obs.tolist() == expected.tolist()
+    assert (a != b).tolist() == (~expected).tolist()
+
+    # Different reference codes
+    a = SparseAlleles([1,1,2,1,-1], refcode=1)
+    b = SparseAlleles([1,2,2,2,1], refcode=2)
+    expected = np.array([True, False, True, False, False]) 
+    assert (a == b).tolist() == expected.tolist()
+    assert (b == a).tolist() == expected.tolist()
+
+    # Different lengths
+    a = SparseAlleles([0, 1, 0])
+    b = SparseAlleles([0] * 99 + [1])
+    assert_raises(ValueError, lambda: a == b)
+    assert_raises(ValueError, lambda: b != a)
+
+def test_sparse_eq_int8_bounds():
+    from pydigree.cydigree.cyfuncs import sparse_eq_int8
+    idx = np.array([1, 5], dtype=np.uint32)
+    val = np.array([1, 1], dtype=np.int8)
+    empty_idx = np.array([], dtype=np.uint32)
+    empty_val = np.array([], dtype=np.int8)
+    assert_raises(IndexError, sparse_eq_int8, idx, val, 0, 
+                  empty_idx, empty_val, 0, 3)
+    assert_raises(IndexError, sparse_eq_int8, empty_idx, empty_val, 0, 
+                  idx, val, 0, 3)
+    assert sparse_eq_int8(idx, val, 0, empty_idx, empty_val, 0, 6).tolist() == \
+        [True, False, True, True, True, False]
 
 def test_sparsealleles_emptylike():
     a = SparseAlleles([1,2,3,4])
@@ -99,6 +160,40 @@ def test_sparsealleles_copyspan():
     a.copy_span(c, 2, 6)
     assert all(a.todense() == np.array([1,1,1,1,1,1,1]))
 #############
+# GenotypeMatrix tests
+#############
+
+
+def test_genotypematrix():
+    c = ChromosomeTemplate()
+    for i in range(4):
+        c.add_genotype()
+
+    m = GenotypeMatrix.empty(3, template=c)
+    assert len(m) == m.nchrom() == 3
+    assert m.nmark() == 4
+    assert m.dtype == np.uint8
+    assert m.missing.all()
+
+    # Rows are views into the matrix
+    row = m[1]
+    assert isinstance(row, Alleles)
+    assert row.template is c
+    row[2] = 1
+    assert m.data[1].tolist() == [0, 0, 1, 0]
+    assert m.missing.sum() == 11
+    assert [list(r) for r in m] == [[0,0,0,0], [0,0,1,0], [0,0,0,0]]
+
+    m2 = GenotypeMatrix.from_alleles([Alleles([1,2,1,1], template=c),
+                                      Alleles([0,0,1,2], template=c)])
+    assert m2.template is c
+    assert (m2 == np.array([[1,2,1,1], [0,0,1,2]])).all()
+    assert np.asarray(m2).shape == (2, 4)
+
+    assert_raises(ValueError, GenotypeMatrix, [1, 2, 3])
+    assert_raises(ValueError, GenotypeMatrix.empty, 3)
+
+#############
 # InheritanceSpan
 #############
 
@@ -165,3 +260,19 @@ def test_labelledallele_delabeler():
     actual_value = chromatid.delabel()
     assert all(actual_value == expected_value)
 
+
+def test_sparsealleles_pickle():
+    import pickle
+    c = ChromosomeTemplate(label='1')
+    for i in range(6):
+        c.add_genotype(0.1, i, label='m{}'.format(i))
+
+    a = SparseAlleles(np.array([0, 1, 0, 0, -1, 0]), template=c)
+    b = pickle.loads(pickle.dumps(a))
+
+    assert not hasattr(a, '__dict__') and not hasattr(c, '__dict__')
+    assert b.size == 6 and b.container.ref == 0
+    assert b.todense().tolist() == [0, 1, 0, 0, -1, 0]
+    assert b.template.label == '1'
+    assert b.template.labels == c.labels
+    assert (b.template.frequencies == c.frequencies).all()
@@ -1,3 +1,4 @@
+import numpy as np
 from pydigree.genotypes import ChromosomeTemplate
 
 def test_chromosometemplate():
@@ -9,4 +10,86 @@ def test_chromosometemplate():
 	assert c.closest_marker(0) == 0
 	assert c.closest_marker(5000001) == 4
 	assert c.closest_marker(5999999) == 5
-	assert c.closest_marker(1e10) == c.nmark() - 1 
\ No newline at end of file
+	assert c.closest_marker(1e10) == c.nmark() - 1 
+def test_chromosometemplate_frequencies():
+	c = ChromosomeTemplate()
+	for i in range(10):
+		c.add_genotype(frequency=0.1, map_position=i)
+
+	# Frequencies are usable before finalizing
+	assert isinstance(c.frequencies, np.ndarray)
+	assert c.frequencies.tolist() == [0.1] * 10
+	assert c.linkageequilibrium_chromosome().nmark() == 10
+
+	c.set_frequency(3, 0.5)
+	c.add_genotype(frequency=0.2, map_position=10)
+	assert c.frequencies.tolist() == [0.1] * 3 + [0.5] + [0.1] * 6 + [0.2]
+
+	c.finalize()
+	assert isinstance(c.frequencies, np.ndarray)
+	assert c.nmark() == len(c.frequencies) == 11
+
+def test_chromosometemplate_frequencies_interleaved():
+	c = ChromosomeTemplate()
+	expected = []
+	for i in range(1000):
+		c.add_genotype(frequency=0.001 * (i + 1), map_position=i)
+		expected.append(0.001 * (i + 1))
+
+		# Reading between adds doesn't copy the frequencies each time
+		assert c.frequencies[-1] == expected[-1]
+		assert len(c.frequencies) == i + 1
+		if i % 100 == 0:
+			c.set_frequency(i, 0.5)
+			expected[i] = 0.5
+	assert c.frequencies.tolist() == expected
+	assert len(c._frequencies) < 2 * len(expected)
+
+	c.frequencies = [0.1, 0.2]
+	assert c.frequencies.tolist() == [0.1, 0.2]
+	c.add_genotype(frequency=0.3)
+	assert c.frequencies.tolist() == [0.1, 0.2, 0.3]
+
+def test_linkageequilibrium_chromosomes():
+	c = ChromosomeTemplate()
+	for freq in [0, 1, 0.5, 0.25]:
+		c.add_genotype(frequency=freq)
+	c.finalize()
+
+	np.random.seed(1)
+	chroms = c.linkageequilibrium_chromosomes(2000)
+	assert len(chroms) == 2000
+	assert all(x.dtype == np.uint8 and x.template is c for x in chroms)
+	
+	chroms = np.array(chroms)
+	assert (chroms[:, 0] == 1).all()
+	assert (chroms[:, 1] == 2).all()
+	assert (chroms >= 1).all() and (chroms <= 2).all()
+
+	observed = (chroms == 2).mean(axis=0)
+	assert abs(observed[2] - 0.5) < 0.05
+	assert abs(observed[3] - 0.25) < 0.05
+
+	chrom = c.linkageequilibrium_chromosome()
+	assert chrom.dtype == np.uint8
+	assert chrom[0] == 1 and chrom[1] == 2
+
+def test_linkageequilibrium_blocks():
+	import pydigree.genotypes.chromosometemplate as ct
+	c = ChromosomeTemplate()
+	for i in range(5):
+		c.add_genotype(frequency=0.3)
+
+	# Drawing in blocks gives the same chromosomes as drawing all at once
+	blocksize = ct.LE_BLOCK_SIZE
+	try:
+		np.random.seed(5)
+		whole = np.array(c.linkageequilibrium_chromosomes(11))
+		ct.LE_BLOCK_SIZE = 10
+		np.random.seed(5)
+		blocked = np.array(c.linkageequilibrium_chromosomes(11))
+	finally:
+		ct.LE_BLOCK_SIZE = blocksize
+
+	assert whole.shape == blocked.shape == (11, 5)
+	assert (whole == blocked).all()
@@ -1,6 +1,8 @@
 from nose.tools import assert_raises
 from pydigree.ibs import ibs, chromwide_ibs
-from pydigree.genotypes import Alleles, SparseAlleles
+from pydigree.ibs import pack_genotypes, unpack_genotypes
+from pydigree.ibs import chromwide_ibs_packed, total_ibs_packed
+from pydigree.genotypes import Alleles, SparseAlleles, GenotypeMatrix
 
 import numpy as np
 
@@ -14,6 +16,26 @@ def test_ibs():
     assert ibs( (1,1), (0,0) ) == None
     assert ibs( (0,0), (1,1) ) == None
 
+    # Integer codes from numpy arrays
+    assert ibs( (np.uint8(1), np.uint8(2)), (np.uint8(2), np.uint8(1)) ) == 2
+    assert ibs( (np.int8(1), np.int8(0)), (1, 1), missingval=64) == 64
+
+    # Alleles that aren't integer codes are compared as python objects
+    assert ibs( ('A','C'), ('C','A') ) == 2
+    assert ibs( ('A','C'), ('C','G') ) == 1
+    assert ibs( ('A','A'), ('C','G') ) == 0
+    assert ibs( ('A',''), ('A','A'), missingval=64 ) == 64
+    assert ibs( (1.5, 2), (1, 2) ) == 1
+    assert ibs( (1.5, 2.0), (2, 1.5) ) == 2
+    f = np.float64
+    assert ibs( (f(1), f(2)), (f(1), f(2)) ) == 2
+    assert ibs( (f(1), f(2)), (f(2), f(1)) ) == 2
+    assert ibs( (f(1.5), f(2)), (f(1), f(2)) ) == 1
+    assert ibs( (np.bool_(True), np.bool_(True)), (np.bool_(True), np.bool_(True)) ) == 2
+    assert ibs( (None, 1), (1, 1) ) == None
+    assert ibs( (1, 1), (1, None), missingval=64 ) == 64
+    assert ibs( (2**70, 1), (2**70, 1) ) == 2
+
 def test_chromwide_ibs():
     g1 = [(2,2), (1,2), (1,2), (1,1), (0, 0)]
     g2 = [(2,2), (1,2), (2,2), (2,2), (1, 1)]
@@ -24,11 +46,53 @@ def test_chromwide_ibs():
     expected = np.array([2,2,1,0,64])
     assert (chromwide_ibs(a,b,c,d) == expected).all()
 
-    # spa, spb = [SparseAlleles(x) for x in zip(*g1)]
-    # spc, spd = [SparseAlleles(x) for x in zip(*g2)]
-    # assert (chromwide_ibs(spa, spb, spc, spd) == expected).all()
+    # Sparse alleles code missing values as -1
+    g1 = [(2,2), (1,2), (1,2), (1,1), (-1, -1)]
+    spa, spb = [SparseAlleles(x, refcode=1) for x in zip(*g1)]
+    spc, spd = [SparseAlleles(x, refcode=1) for x in zip(*g2)]
+    assert (chromwide_ibs(spa, spb, spc, spd) == expected).all()
 
     # Test assertions
     assert_raises(ValueError, chromwide_ibs, a, b, c, d, missingval=600)
     assert_raises(ValueError, chromwide_ibs, a, b, c, d, missingval=-1)
     
+
+def test_chromwide_ibs_matrix():
+    g1 = [(2,2), (1,2), (1,2), (1,1), (0, 0)]
+    g2 = [(2,2), (1,2), (2,2), (2,2), (1, 1)]
+    g3 = [(1,1), (2,1), (1,2), (1,0), (1, 1)]
+
+    a, b = [Alleles(x) for x in zip(*g1)]
+    c, d = [GenotypeMatrix.from_alleles([Alleles(x), Alleles(y)]) 
+            for x, y in zip(zip(*g2), zip(*g3))]
+
+    expected = np.array([[2,2,1,0,64],
+                         [0,2,2,1,64]])
+    assert (chromwide_ibs(a, b, c, d) == expected).all()
+
+def test_pack_genotypes():
+    a = np.array([1, 2, 0, 3] * 20 + [2], dtype=np.uint8)
+    packed = pack_genotypes(a)
+    assert packed.dtype == np.uint64
+    assert len(packed) == 3
+    assert (unpack_genotypes(packed, len(a)) == a).all()
+
+    assert len(pack_genotypes(np.array([], dtype=np.uint8))) == 0
+    assert_raises(ValueError, pack_genotypes, np.array([1, 2, 4]))
+    assert_raises(ValueError, pack_genotypes, np.array([1, -1, 2]))
+
+def test_chromwide_ibs_packed():
+    np.random.seed(10)
+    nmark = 1000
+    a, b, c, d = [Alleles(np.random.randint(0, 3, nmark).astype(np.uint8))
+                  for _ in range(4)]
+
+    expected = chromwide_ibs(a, b, c, d)
+    pa, pb, pc, pd = [pack_genotypes(x) for x in (a, b, c, d)]
+    observed = chromwide_ibs_packed(pa, pb, pc, pd, nmark)
+    assert observed.dtype == np.uint8
+    assert (observed == expected).all()
+
+    assert total_ibs_packed(pa, pb, pc, pd) == expected[expected != 64].sum()
+    assert_raises(ValueError, chromwide_ibs_packed, pa, pb, pc, pd, nmark, 
+                  missingval=600)
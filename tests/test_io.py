@@ -5,9 +5,13 @@ import numpy as np
 from pydigree.exceptions import FileFormatError
 
 from pydigree.io.base import genotypes_from_sequential_alleles
+from pydigree.io.base import read_ped, read_ped_columns, read_phenotypes
+from pydigree.io.base import sex_codes
 from pydigree.io.vcf import vcf_allele_parser
 from pydigree.io import read_plink, read_vcf
 from pydigree.genotypes import Alleles, SparseAlleles, ChromosomeTemplate
+from pydigree.pedigree import Pedigree
+from pydigree.population import Population
 
 TESTDATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_data')
 
@@ -25,11 +29,126 @@ def test_seqalleles():
     # Test to make sure the types returned are correct
     assert all(type(x) is Alleles for x in chain.from_iterable(gts))
 
+    # Alleles are stored as codes for each marker. Numeric alleles are 
+    # coded as their own value, whatever order they appear in.
+    assert all(x.dtype == np.uint8 for x in chain.from_iterable(gts))
+    assert chroms[0].allele_labels == [['1', '2'], ['1']]
+    assert chroms[1].allele_labels == [[None, '2'], ['1', '2']]
+
     # Test to make sure the values are correct
-    assert (gts[0][0] == ['1','1']).all()
-    assert (gts[0][1] == ['2','1']).all()
-    assert (gts[1][0] == ['2','2']).all()
-    assert (gts[1][1] == ['2','1']).all()
+    assert (gts[0][0] == [1, 1]).all()
+    assert (gts[0][1] == [2, 1]).all()
+    assert (gts[1][0] == [2, 2]).all()
+    assert (gts[1][1] == [2, 1]).all()
+    assert chroms[1].decode_alleles(gts[1][0]).tolist() == ['2', '2']
+    assert chroms[1].decode_alleles(gts[1][1]).tolist() == ['2', '1']
+
+    # Other sequences of alleles take the numpy path and give the same codes
+    chroms = [blank_chromosome(2) for x in range(2)]
+    npgts = genotypes_from_sequential_alleles(chroms, np.array(seqalleles))
+    assert chroms[1].allele_labels == [[None, '2'], ['1', '2']]
+    for (a, b), (npa, npb) in zip(gts, npgts):
+        assert (a == npa).all() and (b == npb).all()
+
+    # Too few or too many alleles for the chromosomes, on both paths
+    for alleles in (seqalleles[:-2], seqalleles + ['1', '2']):
+        assert_raises(ValueError, genotypes_from_sequential_alleles, 
+                      chroms, alleles)
+        assert_raises(ValueError, genotypes_from_sequential_alleles, 
+                      chroms, np.array(alleles))
+        assert_raises(ValueError, genotypes_from_sequential_alleles, 
+                      chroms, [int(x) for x in alleles], missing_code=0)
+
+def test_seqalleles_missing():
+    chroms = [blank_chromosome(3)]
+    seqalleles = 'A C 0 0 T A'.split()
+    gts = genotypes_from_sequential_alleles(chroms, seqalleles)
+
+    assert chroms[0].allele_labels == [['A', 'C'], [], ['T', 'A']]
+    assert (gts[0][0] == [1, 0, 1]).all()
+    assert (gts[0][1] == [2, 0, 2]).all()
+    assert (gts[0][0].missing == [False, True, False]).all()
+    assert chroms[0].decode_alleles(gts[0][1]).tolist() == ['C', '0', 'A']
+
+    # Codes are reused for later individuals
+    gts = genotypes_from_sequential_alleles(chroms, 'G T A A 0 C'.split())
+    assert chroms[0].allele_labels == [['A', 'C', 'G', 'T'], ['A'], 
+                                       ['T', 'A', 'C']]
+    assert (gts[0][0] == [3, 1, 0]).all()
+    assert (gts[0][1] == [4, 1, 3]).all()
+
+def test_seqalleles_dtype():
+    chroms = [blank_chromosome(2) for x in range(2)]
+    seqalleles = '1 2 0 0 2 2 2 1'.split()
+    gts = genotypes_from_sequential_alleles(chroms, seqalleles, missing_code=0,
+                                            dtype=np.uint8)
+
+    # Numeric alleles are kept as-is instead of being given codes
+    assert all(x.dtype == np.uint8 for x in chain.from_iterable(gts))
+    assert chroms[0].allele_labels == []
+    assert (gts[0][0] == [1, 0]).all() and (gts[0][1] == [2, 0]).all()
+    assert (gts[1][0] == [2, 2]).all() and (gts[1][1] == [2, 1]).all()
+
+    # The caller's array isn't modified
+    data = np.array([1, 0, 2, 2], dtype=np.int16)
+    gts = genotypes_from_sequential_alleles([blank_chromosome(2)], data, 
+                                            missing_code=-9)
+    assert (data == [1, 0, 2, 2]).all()
+    assert gts[0][0].dtype == np.int16
+    assert not np.may_share_memory(gts[0][0], data)
+
+    data = np.array([1, -9, 2, 2], dtype=np.int16)
+    gts = genotypes_from_sequential_alleles([blank_chromosome(2)], data, 
+                                            missing_code=-9)
+    assert (data == [1, -9, 2, 2]).all()
+    assert (gts[0][0] == [1, 2]).all() and (gts[0][1] == [0, 2]).all()
+
+def test_seqalleles_codeorder():
+    # Numeric labels keep their value, even at a marker that only has
+    # the '2' allele so far
+    chroms = [blank_chromosome(1)]
+    genotypes_from_sequential_alleles(chroms, '2 2'.split())
+    assert chroms[0].allele_labels == [[None, '2']]
+    genotypes_from_sequential_alleles(chroms, np.array('1 2'.split()))
+    assert chroms[0].allele_labels == [['1', '2']]
+
+    # The first other labels at each marker are coded 1 and 2, so ACGT
+    # data is coded like 1/2 data
+    chroms = [blank_chromosome(3)]
+    gts = genotypes_from_sequential_alleles(chroms, 'A G C T G G'.split())
+    assert (gts[0][0] == [1, 1, 1]).all() and (gts[0][1] == [2, 2, 1]).all()
+
+    # A numeric label whose value is already taken gets a free code
+    chroms = [blank_chromosome(1)]
+    gts = genotypes_from_sequential_alleles(chroms, 'G 1'.split())
+    assert chroms[0].allele_labels == [['G', '1']]
+    assert chroms[0].decode_alleles(gts[0][1]).tolist() == ['1']
+
+    # Long alleles, many more than 255 distinct labels on a chromosome
+    nmark = 300
+    chroms = [blank_chromosome(nmark)]
+    seqalleles = list(chain.from_iterable(('A' * (i + 1), 'C' * (i + 1)) 
+                                          for i in range(nmark)))
+    gts = genotypes_from_sequential_alleles(chroms, seqalleles)
+    assert (gts[0][0] == 1).all() and (gts[0][1] == 2).all()
+    assert chroms[0].decode_alleles(gts[0][1])[-1] == 'C' * nmark
+
+    # Too many alleles at one marker
+    chroms = [blank_chromosome(1)]
+    for i in range(255):
+        genotypes_from_sequential_alleles(chroms, ['a{}'.format(i), '0'])
+    assert_raises(ValueError, genotypes_from_sequential_alleles, chroms, 
+                  ['b', '0'])
+
+def test_decode_alleles():
+    chroms = [blank_chromosome(3)]
+    gts = genotypes_from_sequential_alleles(chroms, '1 1 A A 0 0'.split())
+
+    # Codes without a label (e.g. from simulation) decode as strings
+    codes = np.array([2, 1, 3], dtype=np.uint8)
+    assert chroms[0].decode_alleles(codes).tolist() == ['2', 'A', '3']
+    assert chroms[0].decode_alleles(codes - 1).tolist() == ['1', '0', '2']
+    assert blank_chromosome(2).decode_alleles([1, 0]).tolist() == ['1', '0']
 
 @raises(ValueError)
 def test_seqalleles_raiseforbadmissingval():
@@ -38,6 +157,92 @@ def test_seqalleles_raiseforbadmissingval():
     gts = genotypes_from_sequential_alleles(chroms, seqalleles, missing_code=0)
 
 
+def test_read_ped():
+    pedfile = os.path.join(TESTDATA_DIR, 'h2test', 'h2test.pedigrees')
+    peds = read_ped(pedfile)
+    assert len(peds.individuals) == 1200
+
+    with open(pedfile) as f:
+        for line in f:
+            fam, ind, fa, mo, sex, _ = line.split()
+            ind = peds[fam, ind]
+            if fa == '0':
+                assert ind.father is None and ind.mother is None
+            else:
+                assert ind.father is peds[fam, fa]
+                assert ind.mother is peds[fam, mo]
+            assert ind.sex == sex_codes[sex]
+
+def test_read_phenotypes():
+    import tempfile
+    pedfile = os.path.join(TESTDATA_DIR, 'h2test', 'h2test.pedigrees')
+    peds = read_ped(pedfile)
+    inds = [ind for ind in peds.individuals if ind.pedigree.label == '1'][0:3]
+
+    with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+        f.write('famid,id,height,status,label\n')
+        f.write('1,{},1.5,1,a\n'.format(inds[0].label))
+        f.write('1,{},X,X,2\n'.format(inds[1].label))
+        f.write('1,{},,0,X\n'.format(inds[2].label))
+    try:
+        read_phenotypes(peds, f.name)
+    finally:
+        os.remove(f.name)
+
+    assert [ind.phenotypes['height'] for ind in inds] == [1.5, None, None]
+    assert [ind.phenotypes['status'] for ind in inds] == [1.0, None, 0.0]
+    assert all(type(ind.phenotypes['status']) is float for ind in (inds[0], inds[2]))
+    assert [ind.phenotypes['label'] for ind in inds] == ['a', 2.0, None]
+    assert 'famid' not in inds[0].phenotypes and 'id' not in inds[0].phenotypes
+
+def test_connect_individuals():
+    from pydigree.io.base import connect_individuals, PEDRecord
+    p = Pedigree()
+    for line in ['1 1 0 0 1 2', '1 2 0 0 2 2', '1 3 1 2 1 1']:
+        ind = PEDRecord(line).create_individual(Population())
+        p[ind.label] = ind
+
+    connect_individuals(p)
+    child = p['1', '3']
+    assert child.father is p['1', '1'] and child.mother is p['1', '2']
+    assert child in p['1', '1'].children
+
+def test_read_ped_columns():
+    from io import StringIO
+    recs = list(read_ped_columns(StringIO('1\t1\t0\t0\t1\t2\n1\t2\t0\t0\t2\t1\n'), 
+                                 delimiter='\t'))
+    assert [(r.fam, r.ind_id, r.sex, r.aff) for r in recs] == [('1', '1', '1', '2'), 
+                                                             ('1', '2', '2', '1')]
+    assert all(r.data is None for r in recs)
+
+    # No affection status or genotype data
+    recs = list(read_ped_columns(StringIO('1 1 0 0 1\n1 2 0 0 2\n')))
+    assert [(r.fam, r.ind_id, r.aff) for r in recs] == [('1', '1', None), 
+                                                       ('1', '2', None)]
+
+    # Data columns are skipped
+    recs = list(read_ped_columns(StringIO('1 1 0 0 1 -9 1 2\n1 2 0 0 2 -9 2 2\n')))
+    assert [r.aff for r in recs] == ['-9', '-9']
+    assert all(r.data is None for r in recs)
+
+    assert list(read_ped_columns(StringIO(''))) == []
+    assert list(read_ped_columns(StringIO('\n  \n'))) == []
+
+    # Leading blank lines are skipped
+    recs = list(read_ped_columns(StringIO('\n\n1 1 0 0 1 2\n1 2 0 0 2 1\n')))
+    assert [(r.ind_id, r.aff) for r in recs] == [('1', '2'), ('2', '1')]
+
+    # Quote characters are part of the IDs
+    recs = list(read_ped_columns(StringIO('1 "a 0 0 1 2\n1 b" 0 0 2 1\n')))
+    assert [r.ind_id for r in recs] == ['"a', 'b"']
+
+    # Streams that can't seek
+    class Unseekable(StringIO):
+        def seek(self, *args):
+            raise OSError('not seekable')
+    recs = list(read_ped_columns(Unseekable('1 1 0 0 1 2\n1 2 1 0 2 1\n')))
+    assert [(r.ind_id, r.fa) for r in recs] == [('1', '0'), ('2', '1')]
+
 def test_plink():
     plinkped = os.path.join(TESTDATA_DIR, 'plink', 'plink_test.ped')
     plinkmap = os.path.join(TESTDATA_DIR, 'plink', 'plink_test.map')
@@ -47,21 +252,60 @@ def test_plink():
     assert [x.nmark() for x in peds.chromosomes] == [2, 2]
     assert len(peds.individuals) == 2
     
+    # Alleles are stored as codes, which map back to the labels in the file
+    def labelled(ind, chromidx, hapidx):
+        chrom = peds.chromosomes[chromidx]
+        return chrom.decode_alleles(ind.genotypes[chromidx][hapidx]).tolist()
+
     # Test individual 1 genotypes
-    assert (peds['1','1'].genotypes[0][0] == ['1', '1']).all()
-    assert (peds['1','1'].genotypes[0][1] == ['2', '1']).all()
-    assert (peds['1','1'].genotypes[1][0] == ['2', '']).all()
-    assert (peds['1','1'].genotypes[1][1] == ['2', '']).all()
+    ind = peds['1', '1']
+    assert labelled(ind, 0, 0) == ['1', '1']
+    assert labelled(ind, 0, 1) == ['2', '1']
+    assert labelled(ind, 1, 0) == ['2', '0']
+    assert labelled(ind, 1, 1) == ['2', '0']
 
     # Test individual 2 genotypes
-    assert (peds['1', '2'].genotypes[0][0] == ['2', '2']).all()
-    assert (peds['1', '2'].genotypes[0][1] == ['2', '2']).all()
-    assert (peds['1', '2'].genotypes[1][0] == ['1', '']).all()
-    assert (peds['1', '2'].genotypes[1][1] == ['2', '']).all()
+    ind = peds['1', '2']
+    assert labelled(ind, 0, 0) == ['2', '2']
+    assert labelled(ind, 0, 1) == ['2', '2']
+    assert labelled(ind, 1, 0) == ['1', '0']
+    assert labelled(ind, 1, 1) == ['2', '0']
 
     assert (peds['1','1'].genotypes[0][0].missing == [False, False]).all()
     assert (peds['1','1'].genotypes[1][0].missing == [False, True]).all()
 
+    # Label-based lookups go through the allele codes
+    assert peds.allele_frequency((1, 0), '2') == 0.75
+    assert peds.allele_frequency((1, 0), '1') == 0.25
+    assert peds.allele_frequency((0, 1), '2') == 0.5
+    assert peds.major_allele((1, 0)) == '2'
+    assert peds.alleles((1, 0)) == {'1', '2'}
+    assert peds.alleles((0, 1)) == {'1', '2'}
+    assert peds['1', '1'].has_allele((0, 0), '1')
+    assert not peds['1', '1'].has_allele((1, 0), '1')
+    assert peds['1', '2'].has_allele((1, 0), '1')
+    peds.genotype_as_phenotype((1, 0), '2', 'minor')
+    assert peds['1', '1'].phenotypes['minor'] == 2
+    assert peds['1', '2'].phenotypes['minor'] == 1
+
+def test_genomesimla():
+    from pydigree.io.genomesimla import read_gs_chromosome_template
+    templatef = os.path.join(TESTDATA_DIR, 'genomesimla', 'test.chrom')
+    c = read_gs_chromosome_template(templatef)
+
+    assert c.label == '1'
+    assert c.nmark() == 4
+    assert c.labels == ['marker0', 'marker1', 'marker2', 'marker3']
+    assert c.physical_map == [2381, 2831, 2932, 3500]
+    assert np.allclose(c.frequencies, [0.436924709302, 0.738418004802,
+                                       0.342337180849, 0.5])
+    assert np.allclose(c.genetic_map, [0.002381, 0.002831, 0.002932, 0.003932])
+
+    # The template can still be modified until finalized
+    c.add_genotype(0.1, 0.004, label='marker4', bp=4000)
+    c.finalize()
+    assert c.nmark() == len(c.frequencies) == 5
+
 def test_smartopen():
     from pydigree.io.smartopen import smartopen 
     datadir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_data', 'compression')
@@ -1,5 +1,5 @@
 import numpy as np
-from nose.tools import assert_almost_equal
+from nose.tools import assert_almost_equal, assert_raises
 from pydigree.cydigree.sparsearray import SparseArray
 
 
@@ -157,6 +157,25 @@ def test_cmp():
     assert (s == s2) 
     assert (s == [0,1,0,1,0]).tolist() == [True, True, True, True, True]
 
+def test_sparse_eq():
+    a = [0, 1, 2, 0, 1, 0, 3, 0]
+    b = [0, 1, 1, 0, 0, 2, 3, 0]
+    expected = [x == y for x, y in zip(a, b)]
+
+    s, t = SparseArray.from_dense(a, 0), SparseArray.from_dense(b, 0)
+    assert (s == t).tolist() == expected
+    assert (t == s).tolist() == expected
+
+    # Different sparse values
+    t = SparseArray.from_dense(b, 1)
+    assert (s == t).tolist() == expected
+    assert (t == s).tolist() == expected
+
+    # One empty array
+    e = SparseArray(8, 0)
+    assert (s == e).tolist() == [x == 0 for x in a]
+    assert (e == s).tolist() == [x == 0 for x in a]
+
 def test_logic():
     s = SparseArray(5,0)
     assert not s.all()
@@ -212,3 +231,34 @@ def test_copy():
     assert a.tolist() == b.tolist()
     a[1] = 1
     assert a.tolist() != b.tolist()
+
+def test_from_dense_ndarray():
+    npa = np.array([0, 1, 1, 0, 0, -1], dtype=np.int64)
+    a = SparseArray.from_dense(npa, 0)
+    assert a.tolist() == [0, 1, 1, 0, 0, -1]
+    assert a.keys() == [1, 2, 5]
+    assert a.size == 6
+
+    a = SparseArray.from_dense(np.array([], dtype=np.int8), 0)
+    assert a.size == 0
+    assert not a.any()
+
+    # Whole floats are fine, values that don't fit in an int8 aren't
+    assert SparseArray.from_dense([0, 2.0, 1], 0).tolist() == [0, 2, 1]
+    assert_raises(ValueError, SparseArray.from_dense, [0, 200, 1], 0)
+    assert_raises(ValueError, SparseArray.from_dense, [0, -129], 0)
+    assert_raises(ValueError, SparseArray.from_dense, [0, 1.7, 1], 0)
+    assert_raises(ValueError, SparseArray.from_dense, [0, np.nan], 0)
+
+def test_nonsparse_arrays():
+    s = SparseArray(10, 0)
+    s[5] = 1
+    s[2] = -1
+
+    keys, values = s.nonsparse_arrays()
+    assert keys.dtype == np.uint32 and values.dtype == np.int8
+    assert keys.tolist() == [2, 5]
+    assert values.tolist() == [-1, 1]
+
+    keys, values = SparseArray(10, 0).nonsparse_arrays()
+    assert len(keys) == len(values) == 0